@@ -4,13 +4,19 @@ Streamlit app for transforming AI-generated listing files into full analysis fil
 Deploy free on Streamlit Community Cloud.
 """
 
+import hashlib
+import itertools
+import os
 import streamlit as st
 import pandas as pd
+import numpy as np
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import xlsxwriter
 from io import BytesIO
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
+from functools import partial
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CONFIG
@@ -37,6 +43,7 @@ ANALYSIS_COLUMNS = [
     "OEM Interchange Part Number 7", "OEM Interchange Part Number 8",
     "OEM Interchange Part Number 9"
 ]
+_ANALYSIS_COLUMNS_LOWER = tuple((c, c.lower().strip()) for c in ANALYSIS_COLUMNS)
 
 SUPPLEMENTAL_FIELDS = [
     ("Brand", "text", "e.g. Rareelectrical"),
@@ -209,6 +216,14 @@ st.markdown("""
         border-radius: 10px;
     }
 
+    /* Footer caption */
+    [data-testid="stCaptionContainer"], [data-testid="stCaptionContainer"] p {
+        text-align: center;
+        color: #444;
+        font-family: 'JetBrains Mono', monospace;
+        font-size: 11px;
+    }
+
     /* Buttons */
     .stDownloadButton > button {
         background: linear-gradient(135deg, #f59e0b, #d97706) !important;
@@ -230,21 +245,129 @@ st.markdown("""
 # DATA PROCESSING (same logic as desktop version)
 # ═══════════════════════════════════════════════════════════════════════════════
 
-@st.cache_data
-def read_uploaded_file(uploaded_file):
-    """Read uploaded file into dict of sheet_name -> list of dicts."""
+CSV_BLOCK_SIZE = 8 << 20
+# Excel on Windows saves "CSV" as Windows-1252, so that is tried when a file
+# isn't UTF-8.
+CSV_ENCODINGS = ("utf8", "cp1252")
+
+
+def _is_csv(file_name):
+    return file_name.lower().endswith(".csv")
+
+
+def _read_csv(file_bytes, header_only=False):
+    """Read a CSV as a pyarrow Table of text columns, or just its column names with header_only."""
+    for encoding in CSV_ENCODINGS:
+        read_options = pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE, encoding=encoding)
+        try:
+            # The streaming reader only parses the first block, enough for the
+            # header.
+            names = pa_csv.open_csv(BytesIO(file_bytes), read_options=read_options).schema.names
+            if header_only:
+                return names
+            # Every column is read as text: type inference would turn ITEM
+            # "00123" into 123 and part numbers like "1E5" into 100000.0. Only
+            # empty fields become None, as empty cells do in a workbook.
+            convert_options = pa_csv.ConvertOptions(column_types=dict.fromkeys(names, pa.string()),
+                                                    strings_can_be_null=True, null_values=[""])
+            return pa_csv.read_csv(BytesIO(file_bytes), read_options=read_options, convert_options=convert_options)
+        except (pa.ArrowInvalid, UnicodeDecodeError):
+            if encoding == CSV_ENCODINGS[-1]:
+                raise
+
+
+def upload_hash(uploaded_file):
+    """blake2b digest of an upload's bytes; the cached readers are keyed on it."""
+    return hashlib.blake2b(uploaded_file.getvalue(), digest_size=16).digest()
+
+
+def read_uploaded_file(uploaded_file, file_hash):
+    """Scan an uploaded workbook's sheet names and header widths; rows are read by load_sheet."""
+    return _read_file(file_hash, uploaded_file.name, uploaded_file.getvalue())
+
+
+# The cached readers are keyed on the upload's digest, which the caller works
+# out once per file. The bytes are an underscore argument, so Streamlit does
+# not hash the whole file again on every rerun.
+
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60, max_entries=4)
+def _read_file(file_hash, file_name, _file_bytes):
     try:
-        xl = pd.ExcelFile(uploaded_file)
-        sheets = {}
-        for name in xl.sheet_names:
-            df = xl.parse(name)
-            df = df.where(pd.notnull(df), None)
-            sheets[name] = df.to_dict("records")
-        return {"sheets": sheets, "sheet_names": xl.sheet_names, "name": uploaded_file.name}
+        if _is_csv(file_name):
+            # A CSV is a single sheet, named after the file.
+            name = os.path.splitext(file_name)[0]
+            return {"sheet_names": [name], "columns": {name: len(_read_csv(_file_bytes, header_only=True))},
+                    "name": file_name}
+        wb = openpyxl.load_workbook(BytesIO(_file_bytes), read_only=True, data_only=True)
+        try:
+            columns = {ws.title: len(next(ws.iter_rows(max_row=1, values_only=True), ()))
+                       for ws in wb.worksheets}
+            sheet_names = wb.sheetnames
+        finally:
+            wb.close()
+        return {"sheet_names": sheet_names, "columns": columns, "name": file_name}
     except Exception:
         return None
 
 
+def _unique_headers(header):
+    """Name blank headers and number repeats the way pandas does ("Unnamed: 3", "ITEM.1")."""
+    names = [f"Unnamed: {i}" if h is None or h == "" else h for i, h in enumerate(header)]
+    # Numbered names skip any that a real header already uses:
+    # "ITEM", "ITEM.1", "ITEM" -> "ITEM", "ITEM.1", "ITEM.2".
+    taken, counts, out = set(names), {}, []
+    for h in names:
+        n = counts.get(h, 0)
+        if n:
+            while f"{h}.{n}" in taken:
+                n += 1
+            counts[h] = n
+            h = f"{h}.{n}"
+            taken.add(h)
+        counts[h] = counts.get(h, 0) + 1
+        out.append(h)
+    return out
+
+
+def load_sheet(uploaded_file, file_hash, name):
+    """Read a single sheet of an uploaded file into a DataFrame."""
+    headers, rows = _read_sheet(file_hash, uploaded_file.name, name, uploaded_file.getvalue())
+    return pd.DataFrame(rows, columns=headers, dtype=object)
+
+
+@st.cache_resource(show_spinner=False, ttl=24 * 60 * 60, max_entries=4)
+def _read_sheet(file_hash, file_name, name, _file_bytes):
+    """Read one sheet as (headers, tuple of row tuples), the compact form kept in the cache.
+
+    The rows are immutable, so they are cached as a resource and handed out by
+    reference instead of being unpickled on every rerun.
+    """
+    if _is_csv(file_name):
+        table = _read_csv(_file_bytes)
+        table = table.rename_columns(_unique_headers(table.column_names))
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        df = df.astype(object).where(df.notna(), None)
+        return tuple(df.columns), tuple(df.itertuples(index=False, name=None))
+
+    wb = openpyxl.load_workbook(BytesIO(_file_bytes), read_only=True, data_only=True)
+    try:
+        rows = wb[name].iter_rows(values_only=True)
+        headers = _unique_headers(next(rows, ()))
+        values = list(rows)
+    finally:
+        wb.close()
+    # Formatted-but-empty rows at the bottom of a sheet still come back from iter_rows.
+    while values and all(v is None for v in values[-1]):
+        values.pop()
+    # Without an accurate <dimension> record, read-only rows are not padded to
+    # a common width, so fit each one to the header; cells past it have no
+    # column.
+    width = len(headers)
+    if any(len(row) != width for row in values):
+        values = [row[:width] + (None,) * (width - len(row)) for row in values]
+    return tuple(headers), tuple(values)
+
+
 def detect_best_sheet(file_data):
     names = file_data["sheet_names"]
     if len(names) == 1:
@@ -256,28 +379,49 @@ def detect_best_sheet(file_data):
                 return n
     best, max_cols = names[0], 0
     for n in names:
-        data = file_data["sheets"].get(n, [])
-        if data and isinstance(data[0], dict):
-            cols = len(data[0].keys())
-            if cols > max_cols:
-                max_cols = cols
-                best = n
+        cols = file_data["columns"].get(n, 0)
+        if cols > max_cols:
+            max_cols = cols
+            best = n
     return best
 
 
-def detect_fields(data):
-    if not data:
+# Only strings can be blank, so the checks below test just the str cells and
+# leave numbers, dates and booleans alone instead of stringifying every cell.
+# map over isinstance and the str methods keeps the per-cell loop in C.
+
+def _blank_strings(s):
+    """Boolean mask of the empty or whitespace-only strings in a column."""
+    values = s.to_numpy(object)
+    is_str = np.fromiter(map(isinstance, values, itertools.repeat(str)), bool, len(values))
+    strs = values[is_str]
+    blank = np.zeros(len(values), bool)
+    blank[is_str] = np.fromiter(map(str.isspace, strs), bool, len(strs)) | (strs == "")
+    return blank
+
+
+def _non_blank(s):
+    """Mask None/NaN and whitespace-only values in a column to NA."""
+    return s.where(s.notna() & ~_blank_strings(s))
+
+
+def _filled_count(s):
+    """Number of values in a column that are neither None/NaN nor whitespace-only strings."""
+    values = s.to_numpy(object)
+    strs = list(itertools.compress(values, map(isinstance, values, itertools.repeat(str))))
+    return int(s.notna().sum()) - strs.count("") - sum(map(str.isspace, strs))
+
+
+def detect_fields(df):
+    if not len(df):
         return {"present": [], "missing": list(ANALYSIS_COLUMNS), "partial": []}
-    cols = set()
-    for row in data:
-        cols.update(row.keys())
-    col_lower_map = {c.lower().strip(): c for c in cols}
+    col_lower_map = {str(c).lower().strip(): c for c in df.columns}
     present, missing, partial = [], [], []
-    for col in ANALYSIS_COLUMNS:
-        matched = col_lower_map.get(col.lower().strip())
-        if matched:
-            filled = sum(1 for r in data if r.get(matched) is not None and str(r.get(matched, "")).strip())
-            pct = filled / len(data) if data else 0
+    for col, col_lower in _ANALYSIS_COLUMNS_LOWER:
+        matched = col_lower_map.get(col_lower)
+        if matched is not None:
+            filled = _filled_count(df[matched])
+            pct = filled / len(df)
             if pct > 0.8:
                 present.append((col, matched, pct))
             elif pct > 0:
@@ -289,160 +433,188 @@ def detect_fields(data):
     return {"present": present, "missing": missing, "partial": partial}
 
 
-def get_unique_items(data):
-    items = set()
-    for r in data:
-        item = r.get("ITEM") or r.get("Item") or r.get("item")
-        if item:
-            items.add(str(item).strip())
-    return sorted(items)
-
-
-def build_analysis_rows(source_data, global_defaults, supp_data=None):
-    supp_map = {}
-    if supp_data:
-        for r in supp_data:
-            key = r.get("ITEM") or r.get("Item") or r.get("SKU") or r.get("Listing SKU")
-            if not key:
-                vals = list(r.values())
-                key = vals[0] if vals else None
-            if key:
-                supp_map[str(key).strip().upper()] = r
-    rows = []
-    for row in source_data:
-        out = {}
-        row_lower = {k.lower().strip(): k for k in row.keys()}
-        for col in ANALYSIS_COLUMNS:
-            src_key = row_lower.get(col.lower().strip())
-            val = None
-            if src_key and row.get(src_key) is not None and str(row.get(src_key, "")).strip():
-                val = row[src_key]
-            if val is None:
-                item_key = str(row.get("ITEM") or row.get("Item") or "").strip().upper()
-                supp = supp_map.get(item_key)
-                if supp:
-                    supp_lower = {k.lower().strip(): k for k in supp.keys()}
-                    supp_key = supp_lower.get(col.lower().strip())
-                    if supp_key and supp.get(supp_key) is not None and str(supp.get(supp_key, "")).strip():
-                        val = supp[supp_key]
-            if val is None and col in global_defaults and str(global_defaults[col]).strip():
-                val = global_defaults[col]
-            out[col] = val if val is not None else ""
-        if not out.get("Blocked"):
-            out["Blocked"] = False
-        rows.append(out)
-    return rows
-
-
-def build_item_vendor_sheet(rows):
-    seen, out = set(), []
-    for r in rows:
-        item = r.get("ITEM")
-        if item and item not in seen:
-            seen.add(item)
-            out.append({"Fulfillment Type": "", "Item": item, "Trading Partner": r.get("Vendor", ""),
-                        "SKU/UPC": item, "Unit Cost": r.get("Unit Cost", ""), "Is Preferred Vendor": True, "Quantity": ""})
-    return out
+@st.cache_data(show_spinner=False, max_entries=8)
+def _detect_fields_cached(file_hash, sheet_name, _df):
+    """detect_fields keyed on the upload's content hash and sheet; the frame itself is not hashed."""
+    return detect_fields(_df)
+
 
+def get_unique_items(df):
+    items = _first_truthy(df, ["ITEM", "Item", "item"]).dropna()
+    return sorted(set(items.astype(str).str.strip()))
 
-def build_item_sheet(rows, harmonized_code, origin_country):
-    seen, out = set(), []
-    for r in rows:
-        item = r.get("ITEM")
-        if item and item not in seen:
-            seen.add(item)
-            out.append({"ID": "", "Number": item, "Name": item,
-                        "Long Description": r.get("eBay Title", ""), "Unit Cost": r.get("Unit Cost", ""),
-                        **ITEM_SHEET_DEFAULTS, "Trading Partner": r.get("Vendor", ""),
-                        "Retail Price": r.get("BIN", ""),
-                        "Product Category": r.get("Product Type") or r.get("Deposco Category", ""),
-                        "Harmonized Code": harmonized_code, "Short Description": "", "Origin Country": origin_country})
+
+def _truthy(s):
+    return s.notna() & s.astype(bool)
+
+
+def _first_truthy(df, names):
+    """Per row, the first truthy value among the named columns (NA if none)."""
+    out = pd.Series(None, index=df.index, dtype=object)
+    for name in reversed(names):
+        if name in df.columns:
+            out = df[name].where(_truthy(df[name]), out)
     return out
 
 
-def build_pack_sheet(rows):
-    seen, out = set(), []
-    for r in rows:
-        item = r.get("ITEM")
-        if item and item not in seen:
-            seen.add(item)
-            out.append({"Pack Key": f"{item}--Each--1", "Item": item, "Pack Type": "Each", "Quantity": 1,
-                        "Length": r.get("Length", ""), "Length Uom": "Inch",
-                        "Width": r.get("Width", ""), "Width Uom": "Inch",
-                        "Height": r.get("Height", ""), "Height Uom": "Inch",
-                        "Volume": "", "Volume Uom": "",
-                        "Weight": r.get("Weight", ""), "Weight Uom": "Pound"})
+def build_analysis_frame(source_df, global_defaults, supp_df=None):
+    """Fill the analysis columns source → supplemental → global default, column at a time."""
+    src_cols = {str(c).lower().strip(): c for c in source_df.columns}
+    supp = None
+    if supp_df is not None and len(supp_df):
+        key = _first_truthy(supp_df, ["ITEM", "Item", "SKU", "Listing SKU"])
+        key = key.where(_truthy(key), supp_df.iloc[:, 0])
+        has_key = _truthy(key)
+        supp = supp_df[has_key].set_axis(key[has_key].astype(str).str.strip().str.upper())
+        supp = supp[~supp.index.duplicated(keep="last")]
+        supp_cols = {str(c).lower().strip(): c for c in supp.columns}
+        used = [supp_cols[col_lower] for _, col_lower in _ANALYSIS_COLUMNS_LOWER if col_lower in supp_cols]
+        item_key = _first_truthy(source_df, ["ITEM", "Item"]).fillna("").astype(str).str.strip().str.upper()
+        # Blank-check each supplemental record once, then line it up with every
+        # source row sharing its ITEM.
+        supp = supp[used].apply(_non_blank).reindex(item_key).set_axis(source_df.index)
+
+    out = pd.DataFrame(index=source_df.index)
+    for col, col_lower in _ANALYSIS_COLUMNS_LOWER:
+        src_key = src_cols.get(col_lower)
+        if src_key is not None:
+            vals = _non_blank(source_df[src_key])
+        else:
+            vals = pd.Series(None, index=source_df.index, dtype=object)
+        if supp is not None:
+            supp_key = supp_cols.get(col_lower)
+            if supp_key is not None:
+                vals = vals.where(vals.notna(), supp[supp_key])
+        if col in global_defaults and str(global_defaults[col]).strip():
+            vals = vals.where(vals.notna(), global_defaults[col])
+        out[col] = vals.astype(object).where(vals.notna(), "")
+    out["Blocked"] = out["Blocked"].where(_truthy(out["Blocked"]), False)
     return out
 
 
-def build_item_upc_sheet(rows):
-    return [{"ITEM": r.get("ITEM", ""), "UPC": r.get("Listing SKU", ""), "Source": "Listings"} for r in rows]
+def build_all_sheets(analysis_df, harmonized_code, origin_country):
+    """Build the ItemVendor, Item, Pack and ItemUPC sheets as DataFrames from the analysis frame."""
+    upc = pd.DataFrame({"ITEM": analysis_df["ITEM"], "UPC": analysis_df["Listing SKU"], "Source": "Listings"},
+                       dtype=object)
+    # The other sheets get one row per item: the first row of each non-blank ITEM.
+    first = analysis_df[_truthy(analysis_df["ITEM"])].drop_duplicates("ITEM")
+    item, vendor, unit_cost = first["ITEM"], first["Vendor"], first["Unit Cost"]
+    iv = pd.DataFrame({"Fulfillment Type": "", "Item": item, "Trading Partner": vendor,
+                       "SKU/UPC": item, "Unit Cost": unit_cost, "Is Preferred Vendor": True, "Quantity": ""},
+                      dtype=object)
+    product_type = first["Product Type"]
+    item_sheet = pd.DataFrame({"ID": "", "Number": item, "Name": item,
+                               "Long Description": first["eBay Title"], "Unit Cost": unit_cost,
+                               **ITEM_SHEET_DEFAULTS, "Trading Partner": vendor,
+                               "Retail Price": first["BIN"],
+                               "Product Category": product_type.where(_truthy(product_type), first["Deposco Category"]),
+                               "Harmonized Code": harmonized_code, "Short Description": "",
+                               "Origin Country": origin_country},
+                              dtype=object)
+    pack = pd.DataFrame({"Pack Key": item.astype(str) + "--Each--1", "Item": item, "Pack Type": "Each", "Quantity": 1,
+                         "Length": first["Length"], "Length Uom": "Inch",
+                         "Width": first["Width"], "Width Uom": "Inch",
+                         "Height": first["Height"], "Height Uom": "Inch",
+                         "Volume": "", "Volume Uom": "",
+                         "Weight": first["Weight"], "Weight Uom": "Pound"},
+                        dtype=object)
+    return iv, item_sheet, pack, upc
+
+
+HEADER_FORMAT = {
+    "bold": True, "font_name": "Aptos Narrow", "font_size": 10, "font_color": "#FFFFFF",
+    "bg_color": "#2d2d2d", "align": "center", "valign": "vcenter", "text_wrap": True,
+    "border": 1, "border_color": "#3a3a3a",
+}
+CELL_FORMAT = {
+    "font_name": "Aptos Narrow", "font_size": 10, "valign": "vcenter",
+    "border": 1, "border_color": "#3a3a3a",
+}
+DATETIME_FORMAT = {**CELL_FORMAT, "num_format": "yyyy-mm-dd h:mm:ss"}
+DATE_FORMAT = {**CELL_FORMAT, "num_format": "yyyy-mm-dd"}
+TIME_FORMAT = {**CELL_FORMAT, "num_format": "h:mm:ss"}
+DURATION_FORMAT = {**CELL_FORMAT, "num_format": "[hh]:mm:ss"}
 
 
-def export_to_bytes(analysis_rows, harmonized_code, origin_country):
+def export_to_bytes(analysis_df, harmonized_code, origin_country):
     """Create the full multi-sheet Excel file and return as bytes."""
-    wb = openpyxl.Workbook()
-    header_font = Font(name="Aptos Narrow", bold=True, size=10, color="FFFFFF")
-    header_fill = PatternFill("solid", fgColor="2d2d2d")
-    header_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    cell_font = Font(name="Aptos Narrow", size=10)
-    thin_border = Border(
-        left=Side(style="thin", color="3a3a3a"), right=Side(style="thin", color="3a3a3a"),
-        top=Side(style="thin", color="3a3a3a"), bottom=Side(style="thin", color="3a3a3a")
-    )
-
-    def write_sheet(ws, data, columns=None):
-        if not data:
+    buf = BytesIO()
+    # constant_memory flushes each row to a temp file as soon as the next one
+    # starts, so memory stays flat however many rows the sheets have. It also
+    # means rows must be written strictly in order, which rules out
+    # DataFrame.to_excel (it emits cells column by column).
+    # strings_to_urls is off so image URLs stay plain text, as the source had
+    # them; it also skips a URL regex check on every string cell.
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True, "strings_to_urls": False, "remove_timezone": True})
+    header_fmt = wb.add_format(HEADER_FORMAT)
+    cell_fmt = wb.add_format(CELL_FORMAT)
+    datetime_fmt = wb.add_format(DATETIME_FORMAT)
+    date_fmt = wb.add_format(DATE_FORMAT)
+    time_fmt = wb.add_format(TIME_FORMAT)
+    duration_fmt = wb.add_format(DURATION_FORMAT)
+
+    # write_row applies one format to the whole row; dates, times and durations
+    # need a number format on top of it or Excel shows them as serial numbers.
+    def write_datetime(ws, row, col, value, _fmt=None):
+        return ws.write_datetime(row, col, value, datetime_fmt)
+
+    def write_date(ws, row, col, value, _fmt=None):
+        return ws.write_datetime(row, col, value, date_fmt)
+
+    def write_time(ws, row, col, value, _fmt=None):
+        return ws.write_datetime(row, col, value, time_fmt)
+
+    def write_duration(ws, row, col, value, _fmt=None):
+        return ws.write_datetime(row, col, value, duration_fmt)
+
+    def write_sheet(ws, columns, rows):
+        if not rows:
             return
-        if columns is None:
-            columns = list(data[0].keys())
-        for ci, col in enumerate(columns, 1):
-            cell = ws.cell(row=1, column=ci, value=col)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_align
-            cell.border = thin_border
-        for ri, row in enumerate(data, 2):
-            for ci, col in enumerate(columns, 1):
-                val = row.get(col, "")
-                cell = ws.cell(row=ri, column=ci, value=val)
-                cell.font = cell_font
-                cell.border = thin_border
-                cell.alignment = Alignment(vertical="center")
-        for ci, col in enumerate(columns, 1):
-            max_len = len(str(col))
-            for ri in range(2, min(len(data) + 2, 20)):
-                val = str(data[ri - 2].get(col, ""))[:50]
-                max_len = max(max_len, len(val))
-            ws.column_dimensions[get_column_letter(ci)].width = min(max_len + 4, 45)
-        ws.freeze_panes = "A2"
-        if data:
-            ws.auto_filter.ref = f"A1:{get_column_letter(len(columns))}{len(data) + 1}"
-
-    ws1 = wb.active
-    ws1.title = "Rithum Upload"
-    write_sheet(ws1, analysis_rows, ANALYSIS_COLUMNS)
-
-    iv_data = build_item_vendor_sheet(analysis_rows)
-    if iv_data:
-        write_sheet(wb.create_sheet("ItemVendor"), iv_data)
-
-    item_data = build_item_sheet(analysis_rows, harmonized_code, origin_country)
-    if item_data:
-        write_sheet(wb.create_sheet("Item"), item_data)
-
-    pack_data = build_pack_sheet(analysis_rows)
-    if pack_data:
-        write_sheet(wb.create_sheet("Pack"), pack_data)
-
-    upc_data = build_item_upc_sheet(analysis_rows)
-    if upc_data:
-        write_sheet(wb.create_sheet("ItemUPC"), upc_data)
+        for date_type in (datetime, pd.Timestamp):
+            ws.add_write_handler(date_type, write_datetime)
+        ws.add_write_handler(date, write_date)
+        ws.add_write_handler(time, write_time)
+        for duration_type in (timedelta, pd.Timedelta):
+            ws.add_write_handler(duration_type, write_duration)
+        # Size each column from its header and the first 18 values (capped at 50 chars).
+        for ci, (col, sample) in enumerate(zip(columns, zip(*rows[:18]))):
+            max_len = max(len(str(col)), *(min(len(str(v)), 50) for v in sample))
+            ws.set_column(ci, ci, min(max_len + 4, 45))
+        ws.freeze_panes(1, 0)
+        ws.autofilter(0, 0, len(rows), len(columns) - 1)
 
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return buf
+        ws.write_row(0, 0, columns, header_fmt)
+        for ri, row in enumerate(rows, 1):
+            ws.write_row(ri, 0, row, cell_fmt)
+
+    write_sheet(wb.add_worksheet("Rithum Upload"), ANALYSIS_COLUMNS,
+                list(analysis_df[ANALYSIS_COLUMNS].itertuples(index=False, name=None)))
+
+    sheets = build_all_sheets(analysis_df, harmonized_code, origin_country)
+    for name, df in zip(("ItemVendor", "Item", "Pack", "ItemUPC"), sheets):
+        if len(df):
+            write_sheet(wb.add_worksheet(name), list(df.columns), list(df.itertuples(index=False, name=None)))
+
+    wb.close()
+    return buf.getvalue()
+
+
+# Cache keys are the uploads' content hashes and sheet names, taken once when
+# each file is read, so a rerun doesn't rehash the frames; the frames
+# themselves are passed unhashed. These caches are shared by every session,
+# so they are bounded by size and age rather than cleared when one user
+# starts over. The finished workbook is immutable bytes, so it is a
+# cache_resource and is returned without a copy.
+
+@st.cache_data(show_spinner=False, ttl=24 * 60 * 60, max_entries=8)
+def _cached_build_frame(frame_key, defaults, _source_df, _supp_df):
+    return build_analysis_frame(_source_df, dict(defaults), _supp_df)
+
+
+@st.cache_resource(show_spinner=False, ttl=24 * 60 * 60, max_entries=8)
+def _cached_export(frame_key, defaults, harmonized_code, origin_country, _source_df, _supp_df):
+    analysis_df = _cached_build_frame(frame_key, defaults, _source_df, _supp_df)
+    return export_to_bytes(analysis_df, harmonized_code, origin_country)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -496,20 +668,37 @@ def render_field_scan(analysis):
             st.markdown(f'<div class="field-panel field-panel-red"><h4 style="color:#ef4444">Missing</h4>{items_html}</div>', unsafe_allow_html=True)
 
 
+@st.fragment
+def render_download_panel(xlsx_data, file_name):
+    """Download and Start Over buttons; as a fragment, a download click reruns only this panel."""
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        st.download_button(
+            label="💾  Download .xlsx",
+            data=xlsx_data,
+            file_name=file_name,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        )
+    with c2:
+        if st.button("🔄 Start Over"):
+            # The export caches are shared with other sessions, so only this
+            # session's state is dropped.
+            st.session_state.clear()
+            st.rerun()
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # SESSION STATE INIT
 # ═══════════════════════════════════════════════════════════════════════════════
 
 if "step" not in st.session_state:
     st.session_state.step = 0
-if "source_data" not in st.session_state:
-    st.session_state.source_data = None
+if "source_df" not in st.session_state:
+    st.session_state.source_df = None
 if "analysis" not in st.session_state:
     st.session_state.analysis = None
-if "source_name" not in st.session_state:
-    st.session_state.source_name = ""
-if "output_rows" not in st.session_state:
-    st.session_state.output_rows = None
+if "output_df" not in st.session_state:
+    st.session_state.output_df = None
 if "defaults" not in st.session_state:
     st.session_state.defaults = {}
 
@@ -544,10 +733,12 @@ if st.session_state.step == 0:
     uploaded = st.file_uploader("Drop your source listing file", type=["xlsx", "xls", "csv"], key="source_upload")
 
     if uploaded:
-        file_data = read_uploaded_file(uploaded)
+        if st.session_state.get("source_file_id") != uploaded.file_id:
+            st.session_state.source_file_id = uploaded.file_id
+            st.session_state.source_hash = upload_hash(uploaded)
+            st.session_state.base_name = os.path.splitext(uploaded.name)[0]
+        file_data = read_uploaded_file(uploaded, st.session_state.source_hash)
         if file_data:
-            st.session_state.source_name = file_data["name"]
-
             # Sheet selector
             best_sheet = detect_best_sheet(file_data)
             if len(file_data["sheet_names"]) > 1:
@@ -560,13 +751,18 @@ if st.session_state.step == 0:
             else:
                 selected_sheet = best_sheet
 
-            data = file_data["sheets"][selected_sheet]
-            st.session_state.source_data = data
-            analysis = detect_fields(data)
+            try:
+                source_df = load_sheet(uploaded, st.session_state.source_hash, selected_sheet)
+            except Exception:
+                st.error("Could not read file. Make sure it's a valid Excel or CSV file.")
+                st.stop()
+            st.session_state.source_df = source_df
+            st.session_state.source_key = (st.session_state.source_hash, selected_sheet)
+            analysis = _detect_fields_cached(st.session_state.source_hash, selected_sheet, source_df)
             st.session_state.analysis = analysis
 
-            items = get_unique_items(data)
-            st.markdown(f'<p style="color:#888; font-family: JetBrains Mono, monospace; font-size:12px;">{len(data)} rows • {len(items)} unique items • Sheet: {selected_sheet}</p>', unsafe_allow_html=True)
+            items = get_unique_items(source_df)
+            st.markdown(f'<p style="color:#888; font-family: JetBrains Mono, monospace; font-size:12px;">{len(source_df)} rows • {len(items)} unique items • Sheet: {selected_sheet}</p>', unsafe_allow_html=True)
 
             # Scan results
             st.markdown('<div class="section-label">Field Scan Results</div>', unsafe_allow_html=True)
@@ -575,17 +771,16 @@ if st.session_state.step == 0:
             # Preview
             st.markdown("---")
             st.markdown('<div class="section-label">Source Data Preview</div>', unsafe_allow_html=True)
-            preview_cols = [c for c in ["ITEM", "Listing SKU", "Brand", "Amazon Title", "Unit Cost", "Vendor", "Weight"] if c in data[0]] if data else []
-            if preview_cols:
-                preview_df = pd.DataFrame(data[:8])[preview_cols]
-                st.dataframe(preview_df, use_container_width=True, hide_index=True)
+            preview_cols = [c for c in ["ITEM", "Listing SKU", "Brand", "Amazon Title", "Unit Cost", "Vendor", "Weight"] if c in source_df.columns]
+            if preview_cols and len(source_df):
+                st.dataframe(source_df[preview_cols].head(8), use_container_width=True, hide_index=True)
 
             st.markdown("")
             if st.button("Continue to Configuration →", type="primary", use_container_width=False):
                 st.session_state.step = 1
                 st.rerun()
         else:
-            st.error("Could not read file. Make sure it's a valid Excel file.")
+            st.error("Could not read file. Make sure it's a valid Excel or CSV file.")
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -601,14 +796,25 @@ elif st.session_state.step == 1:
     st.markdown('<p style="color:#666; font-size:12px;">Attach a file with per-item prices, dimensions, etc. Rows will be matched by ITEM / SKU column.</p>', unsafe_allow_html=True)
     supp_upload = st.file_uploader("Drop supplemental data file (optional)", type=["xlsx", "xls", "csv"], key="supp_upload")
 
-    supp_data = None
+    supp_df = supp_key = None
     if supp_upload:
-        supp_file = read_uploaded_file(supp_upload)
+        if st.session_state.get("supp_file_id") != supp_upload.file_id:
+            st.session_state.supp_file_id = supp_upload.file_id
+            st.session_state.supp_hash = upload_hash(supp_upload)
+        supp_file = read_uploaded_file(supp_upload, st.session_state.supp_hash)
         if supp_file:
             supp_sheet = supp_file["sheet_names"][0]
-            supp_data = supp_file["sheets"][supp_sheet]
-            st.success(f"✓ Loaded {len(supp_data)} rows from \"{supp_sheet}\"")
-    st.session_state["supp_data"] = supp_data
+            try:
+                supp_df = load_sheet(supp_upload, st.session_state.supp_hash, supp_sheet)
+            except Exception:
+                st.error("Could not read the supplemental file. Make sure it's a valid Excel or CSV file.")
+            else:
+                supp_key = (st.session_state.supp_hash, supp_sheet)
+                st.success(f"✓ Loaded {len(supp_df)} rows from \"{supp_sheet}\"")
+        else:
+            st.error("Could not read the supplemental file. Make sure it's a valid Excel or CSV file.")
+    st.session_state["supp_df"] = supp_df
+    st.session_state["supp_key"] = supp_key
 
     # Defaults
     st.markdown("---")
@@ -669,16 +875,16 @@ elif st.session_state.step == 2:
     # Summary
     st.markdown("---")
     st.markdown('<div class="section-label">Auto-Generated Sheets Summary</div>', unsafe_allow_html=True)
-    data = st.session_state.source_data
-    items = get_unique_items(data) if data else []
+    source_df = st.session_state.source_df
+    items = get_unique_items(source_df)
 
     c1, c2, c3, c4, c5 = st.columns(5)
     sheets_info = [
-        ("📋", "Rithum Upload", f"{len(data)} rows"),
+        ("📋", "Rithum Upload", f"{len(source_df)} rows"),
         ("🏭", "ItemVendor", f"{len(items)} items"),
         ("📦", "Item", f"{len(items)} records"),
         ("📐", "Pack", f"{len(items)} records"),
-        ("🏷️", "ItemUPC", f"{len(data)} rows"),
+        ("🏷️", "ItemUPC", f"{len(source_df)} rows"),
     ]
     for col, (icon, name, desc) in zip([c1, c2, c3, c4, c5], sheets_info):
         with col:
@@ -698,9 +904,10 @@ elif st.session_state.step == 2:
     with c2:
         if st.button("⚡ Generate Analysis File", type="primary"):
             with st.spinner("Generating..."):
-                supp_data = st.session_state.get("supp_data")
-                rows = build_analysis_rows(data, st.session_state.defaults, supp_data)
-                st.session_state.output_rows = rows
+                analysis_df = _cached_build_frame((st.session_state.source_key, st.session_state.get("supp_key")),
+                                                  tuple(sorted(st.session_state.defaults.items())),
+                                                  st.session_state.source_df, st.session_state.get("supp_df"))
+                st.session_state.output_df = analysis_df
                 st.session_state.harmonized_code = harmonized_code
                 st.session_state.origin_country = origin_country
                 st.session_state.step = 3
@@ -712,32 +919,32 @@ elif st.session_state.step == 2:
 # ═══════════════════════════════════════════════════════════════════════════════
 
 elif st.session_state.step == 3:
-    rows = st.session_state.output_rows
-    items = get_unique_items(rows)
+    ss = st.session_state
+    analysis_df = ss.output_df
+    items = get_unique_items(analysis_df)
 
     st.markdown(f"""
     <div class="success-banner">
         <div class="success-icon">✅</div>
         <p class="success-title">Analysis File Ready</p>
-        <p class="success-sub">{len(rows)} listing rows  •  {len(items)} unique items  •  5 sheets</p>
+        <p class="success-sub">{len(analysis_df)} listing rows  •  {len(items)} unique items  •  5 sheets</p>
     </div>
     """, unsafe_allow_html=True)
 
     # Preview
     st.markdown('<div class="section-label">Rithum Upload Preview</div>', unsafe_allow_html=True)
     preview_cols = ["ITEM", "Listing SKU", "Brand", "Amazon Title", "Unit Cost", "Vendor", "Weight"]
-    preview_df = pd.DataFrame(rows[:8])[preview_cols]
-    st.dataframe(preview_df, use_container_width=True, hide_index=True)
+    st.dataframe(analysis_df[preview_cols].head(8), use_container_width=True, hide_index=True)
 
     # Sheet counts
     st.markdown('<div class="section-label">Sheet Summary</div>', unsafe_allow_html=True)
     c1, c2, c3, c4, c5 = st.columns(5)
     counts = [
-        ("Rithum Upload", len(rows)),
+        ("Rithum Upload", len(analysis_df)),
         ("ItemVendor", len(items)),
         ("Item", len(items)),
         ("Pack", len(items)),
-        ("ItemUPC", len(rows)),
+        ("ItemUPC", len(analysis_df)),
     ]
     for col, (name, count) in zip([c1, c2, c3, c4, c5], counts):
         with col:
@@ -749,26 +956,12 @@ elif st.session_state.step == 3:
 
     # Export
     st.markdown("")
-    harmonized = st.session_state.get("harmonized_code", "")
-    origin = st.session_state.get("origin_country", "")
-    buf = export_to_bytes(rows, harmonized, origin)
+    # Built only when Download is clicked; the arguments are bound now because
+    # the callable runs outside the script run.
+    xlsx_data = partial(_cached_export, (ss.source_key, ss.get("supp_key")), tuple(sorted(ss.defaults.items())),
+                        ss.get("harmonized_code", ""), ss.get("origin_country", ""), ss.source_df, ss.get("supp_df"))
 
-    base_name = st.session_state.source_name.replace(".xlsx", "").replace(".xls", "").replace(".csv", "")
-    file_name = f"{base_name}_ANALYSIS.xlsx"
-
-    c1, c2 = st.columns([3, 1])
-    with c1:
-        st.download_button(
-            label="💾  Download .xlsx",
-            data=buf,
-            file_name=file_name,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-    with c2:
-        if st.button("🔄 Start Over"):
-            for key in list(st.session_state.keys()):
-                del st.session_state[key]
-            st.rerun()
+    render_download_panel(xlsx_data, f"{ss.base_name}_ANALYSIS.xlsx")
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -776,8 +969,4 @@ elif st.session_state.step == 3:
 # ═══════════════════════════════════════════════════════════════════════════════
 
 st.markdown("---")
-st.markdown(
-    '<p style="text-align:center; color:#444; font-family: JetBrains Mono, monospace; font-size:11px;">'
-    'Mountain Power • Analysis File Generator v1.0 • 42 fields • 5 sheets</p>',
-    unsafe_allow_html=True
-)
\ No newline at end of file
+st.caption("Mountain Power • Analysis File Generator v1.0 • 42 fields • 5 sheets")
\ No newline at end of file